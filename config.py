@@ -8,6 +8,12 @@ MODEL_PATH = "yolov8x.pt"  # Will be downloaded automatically if not present
 
 # Detection settings
 CONFIDENCE_THRESHOLD = 0.5
+BATCH_SIZE = 4  # Number of frames per YOLO inference call
+USE_TENSORRT = True  # Export/load a TensorRT FP16 engine when CUDA is available
+YOLO_IMGSZ = 960  # YOLO inference resolution; boxes come back in frame coordinates
+USE_PINNED_UPLOAD = True  # Stage frames through pinned memory on CUDA systems
+SKIP_STATIC_FRAMES = True  # Reuse previous detections on near-identical frames
+STATIC_FRAME_THRESHOLD = 3.0  # Mean abs gray diff below which a frame is "static"
 
 # Tracking settings
 MAX_DISAPPEARED_FRAMES = 30
@@ -34,12 +40,14 @@ WORLD_POINTS = [
 ]
 
 # Display settings
+USE_OPENCL_DRAWING = True  # Draw annotations via cv2.UMat when OpenCL is available
 DEFAULT_SHOW_TRAJECTORIES = True
 DEFAULT_SHOW_DETECTION_BOXES = True
 DEFAULT_SHOW_SPEED_INFO = True
 
 # Video processing settings
 DEFAULT_FPS = 25.0  # Fallback FPS if video FPS cannot be determined
+TARGET_FPS = 10.0   # Processing rate; remaining frames are grabbed but not decoded
 
 # Speed validation settings
 MIN_REALISTIC_SPEED = 0    # km/h
@@ -2,9 +2,9 @@
 Data structures for the vehicle speed estimation system.
 """
 
-import math
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Any
+from bisect import insort, bisect_left, bisect_right
 from collections import deque
 from dataclasses import dataclass, field
 
@@ -32,57 +32,160 @@ class Detection:
 
 
 @dataclass
-class TrackPoint:
-    """Represents a point in a vehicle's trajectory."""
-    timestamp: float
-    image_pos: Tuple[float, float]
-    world_pos: Tuple[float, float]
-    speed_kmh: Optional[float] = None
+class Detections:
+    """
+    Structure-of-arrays container for one frame's vehicle detections.
+
+    Keeping box data in contiguous NumPy arrays lets the tracker and
+    the homography batch operate without per-box Python objects.
+    """
+    xyxy: np.ndarray        # float32 (N, 4) boxes as x1, y1, x2, y2
+    conf: np.ndarray        # float32 (N,) confidences
+    cls: np.ndarray         # int32 (N,) COCO class ids
+    names: List[str]        # class name per row
+    _centers: Optional[np.ndarray] = field(default=None, repr=False)
+    # True when these are a previous frame's detections reused by the
+    # static-frame gate; such frames carry no new position information
+    reused: bool = field(default=False, repr=False)
+
+    def __len__(self) -> int:
+        return self.xyxy.shape[0]
+
+    @property
+    def centers(self) -> np.ndarray:
+        """(N, 2) float32 box centers, computed lazily and cached."""
+        if self._centers is None:
+            self._centers = (self.xyxy[:, :2] + self.xyxy[:, 2:4]) * 0.5
+        return self._centers
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        """An empty detection set."""
+        return cls(
+            xyxy=np.empty((0, 4), dtype=np.float32),
+            conf=np.empty(0, dtype=np.float32),
+            cls=np.empty(0, dtype=np.int32),
+            names=[]
+        )
+
+    def as_detection(self, i: int) -> Detection:
+        """Materialize row i as a Detection object (compat accessor)."""
+        x1, y1, x2, y2 = self.xyxy[i]
+        return Detection(
+            x1=float(x1), y1=float(y1), x2=float(x2), y2=float(y2),
+            confidence=float(self.conf[i]),
+            class_id=int(self.cls[i]),
+            class_name=self.names[i]
+        )
+
+
+# Number of trajectory points kept per track
+TRACK_HISTORY = 30
+
+# Number of speed measurements kept per track for smoothing
+SPEED_WINDOW = 10
 
 
 @dataclass
 class VehicleTrack:
-    """Represents a tracked vehicle with its trajectory and speed history."""
+    """Represents a tracked vehicle with its trajectory and speed history.
+
+    World positions, image positions and timestamps live in preallocated
+    ring buffers so speed calculation and trajectory rendering run on
+    contiguous arrays instead of iterating a deque of objects. Image
+    positions are quantized to int32 at insert time so the renderer can
+    pass them straight to cv2.polylines.
+    """
     track_id: int
-    points: deque = field(default_factory=lambda: deque(maxlen=30))
-    speeds: deque = field(default_factory=lambda: deque(maxlen=10))
     last_update: float = 0
     total_distance: float = 0
     frames_tracked: int = 0
-    
-    def add_point(self, point: TrackPoint):
+    world_xy: np.ndarray = field(
+        default_factory=lambda: np.zeros((TRACK_HISTORY, 2), dtype=np.float64))
+    image_xy: np.ndarray = field(
+        default_factory=lambda: np.zeros((TRACK_HISTORY, 2), dtype=np.int32))
+    times: np.ndarray = field(
+        default_factory=lambda: np.zeros(TRACK_HISTORY, dtype=np.float64))
+    n: int = 0      # Number of valid ring-buffer entries (<= TRACK_HISTORY)
+    head: int = 0   # Next ring-buffer write slot
+
+    # Sliding window of speed measurements: insertion order for eviction,
+    # sorted order for the median, and a running sum for the mean
+    _speed_window: deque = field(default_factory=deque, repr=False)
+    _sorted_speeds: List[float] = field(default_factory=list, repr=False)
+    _speed_sum: float = field(default=0.0, repr=False)
+
+    def add_point(self, timestamp: float, image_pos: Tuple[float, float],
+                  world_pos: Tuple[float, float]):
         """Add a new tracking point."""
-        self.points.append(point)
-        self.last_update = point.timestamp
-        self.frames_tracked += 1
-        
         # Calculate distance from previous point
-        if len(self.points) >= 2:
-            prev_world = self.points[-2].world_pos
-            curr_world = point.world_pos
-            distance = math.sqrt(
-                (curr_world[0] - prev_world[0])**2 + 
-                (curr_world[1] - prev_world[1])**2
-            )
-            self.total_distance += distance
+        if self.n > 0:
+            prev_world = self.world_xy[(self.head - 1) % TRACK_HISTORY]
+            self.total_distance += float(np.hypot(
+                world_pos[0] - prev_world[0],
+                world_pos[1] - prev_world[1]
+            ))
+
+        self.world_xy[self.head] = world_pos
+        self.image_xy[self.head, 0] = int(image_pos[0])
+        self.image_xy[self.head, 1] = int(image_pos[1])
+        self.times[self.head] = timestamp
+        self.head = (self.head + 1) % TRACK_HISTORY
+        self.n = min(self.n + 1, TRACK_HISTORY)
+
+        self.last_update = timestamp
+        self.frames_tracked += 1
+
+    def recent_window(self, k: int):
+        """
+        Get the last min(k, n) world positions and timestamps, oldest first.
+
+        Returns:
+            (world_xy, times) arrays of shape (k, 2) and (k,)
+        """
+        k = min(k, self.n)
+        idx = np.arange(self.head - k, self.head) % TRACK_HISTORY
+        return self.world_xy[idx], self.times[idx]
+
+    def image_window(self) -> np.ndarray:
+        """Get all image positions as an (n, 2) int32 array, oldest first."""
+        idx = np.arange(self.head - self.n, self.head) % TRACK_HISTORY
+        return self.image_xy[idx]
     
     def add_speed(self, speed: float):
-        """Add a speed measurement."""
-        if speed > 0:  # Only add valid speeds
-            self.speeds.append(speed)
-    
+        """Add a speed measurement to the sliding window."""
+        if speed <= 0:  # Only add valid speeds
+            return
+
+        if len(self._speed_window) == SPEED_WINDOW:
+            evicted = self._speed_window.popleft()
+            self._speed_sum -= evicted
+            del self._sorted_speeds[bisect_left(self._sorted_speeds, evicted)]
+
+        self._speed_window.append(speed)
+        self._speed_sum += speed
+        insort(self._sorted_speeds, speed)
+
     def get_average_speed(self) -> Optional[float]:
-        """Get smoothed average speed."""
-        if not self.speeds:
+        """Get smoothed average speed (outliers beyond 50% of median dropped).
+
+        Runs on the maintained sorted window and running sum, so no
+        arrays are rebuilt per call.
+        """
+        count = len(self._sorted_speeds)
+        if count == 0:
             return None
-        
-        # Remove outliers (speeds that are too different from median)
-        speeds_list = list(self.speeds)
-        if len(speeds_list) >= 3:
-            median_speed = np.median(speeds_list)
-            filtered_speeds = [s for s in speeds_list 
-                             if abs(s - median_speed) < median_speed * 0.5]
-            if filtered_speeds:
-                return np.mean(filtered_speeds)
-        
-        return np.mean(speeds_list)
\ No newline at end of file
+        if count < 3:
+            return self._speed_sum / count
+
+        median = (self._sorted_speeds[(count - 1) // 2] +
+                  self._sorted_speeds[count // 2]) / 2
+
+        # Keep speeds within 50% of the median; the window is sorted so
+        # the survivors form one contiguous slice
+        lo = bisect_right(self._sorted_speeds, median * 0.5)
+        hi = bisect_left(self._sorted_speeds, median * 1.5)
+        if hi <= lo:
+            return self._speed_sum / count
+
+        return sum(self._sorted_speeds[lo:hi]) / (hi - lo)
\ No newline at end of file
@@ -1,125 +1,236 @@
-"""
-Main script to run the vehicle speed estimation system.
-
-Usage:
-    python main.py
-    
-Controls:
-    - 'q': Quit
-    - 's': Toggle trajectory display
-    - 'd': Toggle detection boxes
-"""
-
-import os
-import cv2
-import time
-
-# Suppress OpenMP warnings
-os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
-
-from speed_detection_system import SpeedDetectionSystem
-import config
-
-
-def main():
-    """Main function to run the speed detection system."""
-    
-    try:
-        # Initialize system
-        print("Initializing speed detection system...")
-        system = SpeedDetectionSystem(
-            model_path=config.MODEL_PATH, 
-            confidence_threshold=config.CONFIDENCE_THRESHOLD
-        )
-        
-        # Set display preferences
-        system.show_trajectories = config.DEFAULT_SHOW_TRAJECTORIES
-        system.show_detection_boxes = config.DEFAULT_SHOW_DETECTION_BOXES
-        system.show_speed_info = config.DEFAULT_SHOW_SPEED_INFO
-        
-        # Calibrate perspective transformation
-        print("Calibrating perspective transformation...")
-        if not system.calibrate_perspective(config.IMAGE_POINTS, config.WORLD_POINTS):
-            print("Failed to calibrate perspective transformation")
-            return
-        
-        # Open video
-        print(f"Opening video: {config.VIDEO_PATH}")
-        cap = cv2.VideoCapture(config.VIDEO_PATH)
-        if not cap.isOpened():
-            print(f"Error: Could not open video file {config.VIDEO_PATH}")
-            return
-        
-        # Get video properties
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps <= 0 or fps > 1000:
-            fps = config.DEFAULT_FPS
-        print(f"Video FPS: {fps}")
-        
-        frame_count = 0
-        start_time = time.time()
-        
-        print("Starting video processing...")
-        print("Controls: 'q' to quit, 's' to toggle trajectories, 'd' to toggle detection boxes")
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            timestamp = frame_count / fps
-            
-            # Process frame
-            try:
-                processed_frame = system.process_frame(frame, timestamp)
-                
-                # Display frame
-                cv2.imshow('Vehicle Speed Detection', processed_frame)
-                
-                # Handle key presses
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'):
-                    break
-                elif key == ord('s'):
-                    system.show_trajectories = not system.show_trajectories
-                    print(f"Trajectories: {'ON' if system.show_trajectories else 'OFF'}")
-                elif key == ord('d'):
-                    system.show_detection_boxes = not system.show_detection_boxes
-                    print(f"Detection boxes: {'ON' if system.show_detection_boxes else 'OFF'}")
-                
-            except Exception as e:
-                print(f"Error processing frame {frame_count}: {e}")
-                continue
-        
-        # Print final statistics
-        elapsed_time = time.time() - start_time
-        stats = system.speed_estimator.get_statistics()
-        
-        print("\n" + "="*50)
-        print("FINAL STATISTICS")
-        print("="*50)
-        print(f"Processing time: {elapsed_time:.1f} seconds")
-        print(f"Frames processed: {frame_count}")
-        print(f"Average FPS: {frame_count/elapsed_time:.1f}")
-        print(f"Total vehicles detected: {stats['total_vehicles']}")
-        print(f"Speed measurements: {stats['measurements']}")
-        
-        if stats['average_speed'] is not None:
-            print(f"Average speed: {stats['average_speed']:.1f} ± {stats['std_speed']:.1f} km/h")
-            print(f"Speed range: {stats['min_speed']:.1f} - {stats['max_speed']:.1f} km/h")
-        
-    except KeyboardInterrupt:
-        print("\nInterrupted by user")
-    except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        # Cleanup
-        if 'cap' in locals():
-            cap.release()
-        cv2.destroyAllWindows()
-        print("Cleanup completed")
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+"""
+Main script to run the vehicle speed estimation system.
+
+The processing pipeline runs as three overlapping stages:
+    1. Reader thread: grabs/decodes frames from the video
+    2. Detector thread: YOLO inference + tracking + speed estimation
+    3. Main thread: annotation and display
+
+Usage:
+    python main.py
+
+Controls:
+    - 'q': Quit
+    - 's': Toggle trajectory display
+    - 'd': Toggle detection boxes
+"""
+
+import os
+import cv2
+import time
+import queue
+import threading
+
+# Suppress OpenMP warnings
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+from speed_detection_system import SpeedDetectionSystem
+import config
+
+
+def put_latest(q, item):
+    """Put item on a bounded queue, dropping the oldest entry when full."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def reader_worker(cap, fps, process_every_n, frame_q, stop_event):
+    """Read frames from the capture and push (frame, timestamp) pairs."""
+    frame_count = 0
+    while not stop_event.is_set():
+        # grab() only advances the stream; decoding happens in retrieve()
+        if not cap.grab():
+            break
+
+        frame_count += 1
+        if frame_count % process_every_n:
+            continue
+
+        ret, frame = cap.retrieve()
+        if not ret:
+            continue
+
+        put_latest(frame_q, (frame, frame_count / fps))
+
+    frame_q.put(None)  # Sentinel: end of stream
+
+
+def detector_worker(system, frame_q, render_q, stop_event):
+    """Run detection/tracking on batches of frames and push results."""
+    batch = []
+    done = False
+
+    while not done and not stop_event.is_set():
+        item = frame_q.get()
+        if item is None:
+            done = True
+        else:
+            batch.append(item)
+            if len(batch) < config.BATCH_SIZE:
+                continue
+
+        if not batch:
+            break
+
+        frames = [frame for frame, _ in batch]
+        timestamps = [timestamp for _, timestamp in batch]
+        batch = []
+
+        try:
+            batch_results = system.detect_and_track_batch(frames, timestamps)
+        except Exception as e:
+            print(f"Error processing batch at t={timestamps[-1]:.1f}s: {e}")
+            continue
+
+        for frame, timestamp, result in zip(frames, timestamps, batch_results):
+            render_q.put((frame, timestamp, result))
+
+    render_q.put(None)  # Sentinel: end of stream
+
+
+def main():
+    """Main function to run the speed detection system."""
+
+    try:
+        # Initialize system
+        print("Initializing speed detection system...")
+        system = SpeedDetectionSystem(
+            model_path=config.MODEL_PATH,
+            confidence_threshold=config.CONFIDENCE_THRESHOLD,
+            use_tensorrt=config.USE_TENSORRT,
+            use_opencl=config.USE_OPENCL_DRAWING,
+            imgsz=config.YOLO_IMGSZ,
+            use_pinned=config.USE_PINNED_UPLOAD,
+            skip_static=config.SKIP_STATIC_FRAMES,
+            static_threshold=config.STATIC_FRAME_THRESHOLD,
+            batch_size=config.BATCH_SIZE
+        )
+
+        # Set display preferences
+        system.show_trajectories = config.DEFAULT_SHOW_TRAJECTORIES
+        system.show_detection_boxes = config.DEFAULT_SHOW_DETECTION_BOXES
+        system.show_speed_info = config.DEFAULT_SHOW_SPEED_INFO
+
+        # Calibrate perspective transformation
+        print("Calibrating perspective transformation...")
+        if not system.calibrate_perspective(config.IMAGE_POINTS, config.WORLD_POINTS):
+            print("Failed to calibrate perspective transformation")
+            return
+
+        # Open video
+        print(f"Opening video: {config.VIDEO_PATH}")
+        cap = cv2.VideoCapture(config.VIDEO_PATH)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file {config.VIDEO_PATH}")
+            return
+
+        # Keep the capture queue short so frames don't add latency
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Get video properties
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if fps <= 0 or fps > 1000:
+            fps = config.DEFAULT_FPS
+
+        # Only fully decode every Nth frame; the rest are grabbed (no decode)
+        process_every_n = max(1, int(fps / config.TARGET_FPS))
+        print(f"Video FPS: {fps} (processing every {process_every_n} frame(s))")
+
+        print("Starting video processing...")
+        print("Controls: 'q' to quit, 's' to toggle trajectories, 'd' to toggle detection boxes")
+
+        # Small queues keep the pipeline close to realtime: the reader
+        # drops stale frames instead of letting them pile up.
+        frame_q = queue.Queue(maxsize=2)
+        render_q = queue.Queue(maxsize=2 * config.BATCH_SIZE)
+        stop_event = threading.Event()
+
+        reader = threading.Thread(
+            target=reader_worker,
+            args=(cap, fps, process_every_n, frame_q, stop_event),
+            daemon=True
+        )
+        detector = threading.Thread(
+            target=detector_worker,
+            args=(system, frame_q, render_q, stop_event),
+            daemon=True
+        )
+        reader.start()
+        detector.start()
+
+        frames_shown = 0
+        start_time = time.time()
+
+        while True:
+            item = render_q.get()
+            if item is None:
+                break
+
+            frame, timestamp, result = item
+
+            # One bad frame should be skipped, not end the run
+            try:
+                annotated_frame = system.annotate_frame(frame, timestamp, result)
+                frames_shown += 1
+
+                # Display frame
+                cv2.imshow('Vehicle Speed Detection', annotated_frame)
+
+                # Handle key presses
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    stop_event.set()
+                    break
+                elif key == ord('s'):
+                    system.show_trajectories = not system.show_trajectories
+                    print(f"Trajectories: {'ON' if system.show_trajectories else 'OFF'}")
+                elif key == ord('d'):
+                    system.show_detection_boxes = not system.show_detection_boxes
+                    print(f"Detection boxes: {'ON' if system.show_detection_boxes else 'OFF'}")
+
+            except Exception as e:
+                print(f"Error displaying frame at t={timestamp:.1f}s: {e}")
+                continue
+
+        stop_event.set()
+        reader.join(timeout=2.0)
+        detector.join(timeout=2.0)
+
+        # Print final statistics
+        elapsed_time = time.time() - start_time
+        stats = system.speed_estimator.get_statistics()
+
+        print("\n" + "="*50)
+        print("FINAL STATISTICS")
+        print("="*50)
+        print(f"Processing time: {elapsed_time:.1f} seconds")
+        print(f"Frames processed: {frames_shown}")
+        print(f"Average FPS: {frames_shown/elapsed_time:.1f}")
+        print(f"Total vehicles detected: {stats['total_vehicles']}")
+        print(f"Speed measurements: {stats['measurements']}")
+
+        if stats['average_speed'] is not None:
+            print(f"Average speed: {stats['average_speed']:.1f} ± {stats['std_speed']:.1f} km/h")
+            print(f"Speed range: {stats['min_speed']:.1f} - {stats['max_speed']:.1f} km/h")
+
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        # Cleanup
+        if 'cap' in locals():
+            cap.release()
+        cv2.destroyAllWindows()
+        print("Cleanup completed")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,15 @@ import cv2
 import numpy as np
 from typing import List, Tuple
 
+from kernels import NUMBA_AVAILABLE, project_points
+
 
 class PerspectiveTransformer:
     """Handles perspective transformation from image to world coordinates."""
     
     def __init__(self):
-        self.matrix = None
-        self.inverse_matrix = None
+        self.matrix = None          # float32, contiguous; shared with the JIT kernel
+        self.inverse_matrix = None  # computed lazily on first world_to_image call
     
     def calibrate(self, image_points: List[Tuple[float, float]], 
                   world_points: List[Tuple[float, float]]) -> bool:
@@ -34,9 +36,17 @@ class PerspectiveTransformer:
             img_pts = np.float32(image_points).reshape(-1, 1, 2)
             world_pts = np.float32(world_points).reshape(-1, 1, 2)
             
-            self.matrix = cv2.getPerspectiveTransform(img_pts, world_pts)
-            self.inverse_matrix = cv2.getPerspectiveTransform(world_pts, img_pts)
-            
+            # Stored float32 and contiguous so both cv2 and the numba
+            # kernel consume it without per-call dtype conversion; the
+            # inverse is only computed if world_to_image is ever called
+            self.matrix = np.ascontiguousarray(
+                cv2.getPerspectiveTransform(img_pts, world_pts), dtype=np.float32)
+            self.inverse_matrix = None
+
+            # Warm up the JIT kernel now so the first frame doesn't pay
+            # the compilation latency
+            self.image_to_world_batch(np.zeros((1, 2), dtype=np.float32))
+
             print("✓ Perspective transformation calibrated successfully")
             return True
             
@@ -53,11 +63,43 @@ class PerspectiveTransformer:
         transformed = cv2.perspectiveTransform(points_array, self.matrix)
         return [tuple(pt[0]) for pt in transformed]
     
+    def image_to_world_batch(self, points: np.ndarray) -> np.ndarray:
+        """
+        Transform an (N, 2) array of image points to world coordinates.
+
+        With numba installed this runs a fused JIT kernel that keeps the
+        3x3 matrix in registers and allocates nothing but the output;
+        otherwise it falls back to a single NumPy matmul. Either way the
+        per-call overhead of N separate cv2.perspectiveTransform calls
+        is amortized into one call per frame.
+        """
+        if self.matrix is None:
+            raise ValueError("Transformer not calibrated")
+
+        pts = np.ascontiguousarray(points, dtype=np.float32)
+
+        if NUMBA_AVAILABLE:
+            out = np.empty_like(pts)
+            project_points(self.matrix, pts, out)
+            return out
+
+        homogeneous = np.empty((pts.shape[0], 3), dtype=np.float32)
+        homogeneous[:, :2] = pts
+        homogeneous[:, 2] = 1.0
+
+        projected = homogeneous @ self.matrix.T
+        return projected[:, :2] / projected[:, 2:3]
+
     def world_to_image(self, points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
         """Transform points from world to image coordinates."""
-        if self.inverse_matrix is None:
+        if self.matrix is None:
             raise ValueError("Transformer not calibrated")
-        
+
+        if self.inverse_matrix is None:
+            # Not on the hot path; invert the forward homography on demand
+            self.inverse_matrix = np.linalg.inv(
+                self.matrix.astype(np.float64)).astype(np.float32)
+
         points_array = np.float32(points).reshape(-1, 1, 2)
         transformed = cv2.perspectiveTransform(points_array, self.inverse_matrix)
         return [tuple(pt[0]) for pt in transformed]
\ No newline at end of file
@@ -3,6 +3,7 @@ Complete vehicle speed detection system that integrates all components.
 """
 
 import cv2
+import threading
 import numpy as np
 from typing import List, Tuple, Optional
 
@@ -15,9 +16,23 @@ from speed_estimator import SpeedEstimator
 class SpeedDetectionSystem:
     """Complete vehicle speed detection system."""
     
-    def __init__(self, model_path: str = "yolov8x.pt", confidence_threshold: float = 0.5):
+    def __init__(self, model_path: str = "yolov8x.pt", confidence_threshold: float = 0.5,
+                 use_tensorrt: bool = True, use_opencl: bool = True,
+                 imgsz: int = 960, use_pinned: bool = True,
+                 skip_static: bool = True, static_threshold: float = 3.0,
+                 batch_size: int = 4):
         # Initialize components
-        self.detector = VehicleDetector(model_path, confidence_threshold)
+        self.detector = VehicleDetector(model_path, confidence_threshold,
+                                        use_tensorrt, imgsz, use_pinned,
+                                        skip_static, static_threshold,
+                                        batch_size)
+
+        # Draw through OpenCL (cv2.UMat) when a device is available, so
+        # annotation overlaps with other CPU/GPU work
+        self.use_opencl = use_opencl and cv2.ocl.haveOpenCL()
+        if self.use_opencl and not self._opencl_draw_ok():
+            print("Warning: OpenCL drawing self-check failed, using CPU drawing")
+            self.use_opencl = False
         self.tracker = SimpleTracker()
         self.transformer = PerspectiveTransformer()
         self.speed_estimator = None  # Will be initialized after calibration
@@ -26,7 +41,38 @@ class SpeedDetectionSystem:
         self.show_trajectories = True
         self.show_detection_boxes = True
         self.show_speed_info = True
+
+        # Guards speed estimator state when detection and annotation
+        # run on different threads
+        self.track_lock = threading.Lock()
+
+        # Next video timestamp at which old tracks are purged
+        self._next_cleanup = 0.0
+
+        # Last real (non-reused) tracking result, re-annotated on frames
+        # the static gate skipped
+        self._last_tracked = []
+
+        # getTextSize results keyed by label text; sizes are recomputed
+        # only for labels not seen before
+        self._text_size_cache = {}
         
+    def _opencl_draw_ok(self) -> bool:
+        """
+        Exercise the UMat draw ops annotate_frame uses, so an OpenCV
+        build that rejects any of them is caught once at startup instead
+        of crashing on the first annotated frame.
+        """
+        try:
+            canvas = cv2.UMat(np.zeros((32, 32, 3), dtype=np.uint8))
+            cv2.rectangle(canvas, (1, 1), (30, 30), (0, 255, 0), 2)
+            cv2.putText(canvas, "ok", (2, 16),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+            canvas.get()
+            return True
+        except cv2.error:
+            return False
+
     def calibrate_perspective(self, image_points: List[Tuple[float, float]], 
                             world_points: List[Tuple[float, float]]) -> bool:
         """Calibrate perspective transformation."""
@@ -39,28 +85,117 @@ class SpeedDetectionSystem:
         """Process a single frame and return annotated result."""
         if self.speed_estimator is None:
             raise ValueError("System not calibrated. Call calibrate_perspective() first.")
-        
-        # Detect vehicles
-        detections = self.detector.detect(frame)
-        
-        # Update tracker
-        tracked_objects = self.tracker.update(detections)
-        
-        # Update speed estimation and draw annotations
-        annotated_frame = frame.copy()
-        
-        for track_id, detection in tracked_objects:
+
+        results = self.detect_and_track_batch([frame], [timestamp])
+        return self.annotate_frame(frame, timestamp, results[0])
+
+    def process_batch(self, frames: List[np.ndarray],
+                      timestamps: List[float]) -> List[np.ndarray]:
+        """
+        Process a batch of frames with a single YOLO call and return
+        annotated results in order.
+        """
+        results = self.detect_and_track_batch(frames, timestamps)
+        return [self.annotate_frame(frame, timestamp, result)
+                for frame, timestamp, result
+                in zip(frames, timestamps, results)]
+
+    def detect_and_track_batch(self, frames: List[np.ndarray],
+                               timestamps: List[float]) -> List[Tuple]:
+        """
+        Run detection, tracking and speed estimation for a batch of frames.
+
+        This is the compute stage of the pipeline and must run on a single
+        thread; annotation can then happen on another thread via
+        annotate_frame().
+
+        Returns:
+            One (detections, tracked) pair per frame, where tracked is a
+            list of (track_id, detection_index, speed) tuples
+        """
+        if self.speed_estimator is None:
+            raise ValueError("System not calibrated. Call calibrate_perspective() first.")
+
+        # Detect vehicles in all frames at once
+        batch_detections = self.detector.detect_batch(frames)
+
+        batch_results = []
+        for detections, timestamp in zip(batch_detections, timestamps):
+            # Detections reused by the static gate carry no new position
+            # information: feeding them through tracking/speed estimation
+            # would inject zero-displacement points at advancing
+            # timestamps and drag speeds toward zero. Re-annotate the
+            # last real result instead.
+            if detections.reused:
+                batch_results.append((detections, self._last_tracked))
+                continue
+
+            # Update tracker
+            tracked_objects = self.tracker.update(detections)
+
+            # Transform all tracked detection centers to world coordinates
+            world_positions = []
+            if tracked_objects:
+                centers = detections.centers[[det_idx for _, det_idx in tracked_objects]]
+                world_positions = self.transformer.image_to_world_batch(centers)
+
             # Update speed estimation
-            speed = self.speed_estimator.update(track_id, detection, timestamp)
-            
+            with self.track_lock:
+                tracked = [(track_id, det_idx,
+                            self.speed_estimator.update(
+                                track_id, tuple(detections.centers[det_idx]), timestamp,
+                                world_pos=tuple(world_positions[i])))
+                           for i, (track_id, det_idx) in enumerate(tracked_objects)]
+
+                # Cleanup old tracks periodically
+                if timestamp >= self._next_cleanup:
+                    self.speed_estimator.cleanup_old_tracks(timestamp)
+                    self._next_cleanup = timestamp + 10.0
+
+            self._last_tracked = tracked
+            batch_results.append((detections, tracked))
+
+        return batch_results
+
+    def annotate_frame(self, frame: np.ndarray, timestamp: float,
+                       result: Tuple) -> np.ndarray:
+        """
+        Draw annotations for one frame of detect_and_track_batch output.
+
+        Draws directly into the given frame (no copy) since nothing
+        downstream needs the unannotated pixels. With OpenCL enabled the
+        draw calls run against a cv2.UMat and the result is downloaded
+        once at the end.
+        """
+        detections, tracked = result
+
+        # Draw trajectories first, on the raw frame: cv2.polylines
+        # cannot target a UMat, and doing all tracks here needs only one
+        # lock acquisition
+        if self.show_trajectories and tracked:
+            with self.track_lock:
+                trajectories = [
+                    track.image_window() for track in
+                    (self.speed_estimator.vehicle_tracks.get(track_id)
+                     for track_id, _, _ in tracked)
+                    if track is not None and track.n > 1
+                ]
+            for trajectory in trajectories:
+                cv2.polylines(frame, [trajectory], False, (255, 255, 0), 2)
+
+        annotated_frame = cv2.UMat(frame) if self.use_opencl else frame
+
+        # Quantize all box corners once; rows below are already integer
+        xyxy = detections.xyxy.astype(np.int32)
+
+        for track_id, det_idx, speed in tracked:
+            x1, y1, x2, y2 = xyxy[det_idx]
+
             # Draw detection box
             if self.show_detection_boxes:
                 color = self._get_speed_color(speed)
-                cv2.rectangle(annotated_frame, 
-                            (int(detection.x1), int(detection.y1)),
-                            (int(detection.x2), int(detection.y2)),
-                            color, 2)
-            
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+
             # Draw speed information
             if self.show_speed_info:
                 speed_text = f"ID:{track_id}"
@@ -68,48 +203,43 @@ class SpeedDetectionSystem:
                     speed_text += f" {speed:.1f} km/h"
                 else:
                     speed_text += " Calculating..."
-                
-                # Text background
-                text_size = cv2.getTextSize(speed_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+
+                # Text background, measured once per unique label
+                text_size = self._text_size_cache.get(speed_text)
+                if text_size is None:
+                    if len(self._text_size_cache) > 1024:
+                        self._text_size_cache.clear()
+                    text_size = cv2.getTextSize(
+                        speed_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+                    self._text_size_cache[speed_text] = text_size
+
                 cv2.rectangle(annotated_frame,
-                            (int(detection.x1), int(detection.y1) - 30),
-                            (int(detection.x1) + text_size[0] + 10, int(detection.y1) - 5),
+                            (x1, y1 - 30),
+                            (x1 + text_size[0] + 10, y1 - 5),
                             (0, 0, 0), -1)
-                
+
                 color = self._get_speed_color(speed)
                 cv2.putText(annotated_frame, speed_text,
-                          (int(detection.x1) + 5, int(detection.y1) - 10),
+                          (x1 + 5, y1 - 10),
                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            # Draw trajectory
-            if self.show_trajectories and track_id in self.speed_estimator.vehicle_tracks:
-                track = self.speed_estimator.vehicle_tracks[track_id]
-                if len(track.points) > 1:
-                    points = [pt.image_pos for pt in track.points]
-                    for i in range(1, len(points)):
-                        cv2.line(annotated_frame,
-                               (int(points[i-1][0]), int(points[i-1][1])),
-                               (int(points[i][0]), int(points[i][1])),
-                               (255, 255, 0), 2)
-        
+
         # Add frame statistics
-        stats = self.speed_estimator.get_statistics()
+        with self.track_lock:
+            stats = self.speed_estimator.get_statistics()
         info_lines = [
-            f"Vehicles: {len(tracked_objects)} active, {stats['total_vehicles']} total",
+            f"Vehicles: {len(tracked)} active, {stats['total_vehicles']} total",
             f"Speed measurements: {stats['measurements']}"
         ]
-        
+
         if stats['average_speed'] is not None:
             info_lines.append(f"Avg speed: {stats['average_speed']:.1f} km/h")
-        
+
         for i, line in enumerate(info_lines):
             cv2.putText(annotated_frame, line, (10, 30 + i*25),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # Cleanup old tracks periodically
-        if int(timestamp) % 10 == 0:  # Every 10 seconds
-            self.speed_estimator.cleanup_old_tracks(timestamp)
-        
+
+        if self.use_opencl:
+            return annotated_frame.get()
         return annotated_frame
     
     def _get_speed_color(self, speed: Optional[float]) -> Tuple[int, int, int]:
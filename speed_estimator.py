@@ -2,11 +2,12 @@
 Speed estimation using tracking and perspective transformation.
 """
 
+import heapq
 import math
-import numpy as np
-from typing import Dict, Optional, Any
-from data_structures import Detection, TrackPoint, VehicleTrack
+from typing import Dict, Optional, Any, Tuple
+from data_structures import VehicleTrack
 from perspective_transformer import PerspectiveTransformer
+from kernels import calc_speed
 
 try:
     from scipy.signal import savgol_filter
@@ -25,95 +26,85 @@ class SpeedEstimator:
         self.min_track_points = min_track_points
         self.speed_smoothing_window = speed_smoothing_window
         
-        # Statistics
+        # Statistics: running Welford accumulators, O(1) per measurement
         self.total_vehicles = 0
-        self.speed_measurements = []
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min_speed = math.inf
+        self._max_speed = -math.inf
+
+        # Min-heap of (last_update, track_id) so cleanup only touches
+        # entries old enough to be candidates instead of scanning all tracks
+        self._expiry_heap = []
     
-    def update(self, track_id: int, detection: Detection, timestamp: float) -> Optional[float]:
+    def update(self, track_id: int, center: Tuple[float, float], timestamp: float,
+               world_pos: Optional[Tuple[float, float]] = None) -> Optional[float]:
         """
         Update tracking for a vehicle and estimate speed.
-        
+
         Args:
             track_id: Unique identifier for the track
-            detection: Vehicle detection
+            center: Image-space center of the vehicle detection
             timestamp: Current timestamp in seconds
-            
+            world_pos: Precomputed world position of the center;
+                       transformed here if not provided
+
         Returns:
             Estimated speed in km/h, or None if not enough data
         """
         # Get world coordinates
-        world_pos = self.transformer.image_to_world([detection.center])[0]
-        
-        # Create track point
-        track_point = TrackPoint(
-            timestamp=timestamp,
-            image_pos=detection.center,
-            world_pos=world_pos
-        )
-        
+        if world_pos is None:
+            world_pos = self.transformer.image_to_world([center])[0]
+
         # Initialize or update track
         if track_id not in self.vehicle_tracks:
             self.vehicle_tracks[track_id] = VehicleTrack(track_id=track_id)
             self.total_vehicles += 1
-        
+
         track = self.vehicle_tracks[track_id]
-        track.add_point(track_point)
+        track.add_point(timestamp, center, world_pos)
+        heapq.heappush(self._expiry_heap, (timestamp, track_id))
         
         # Calculate speed if we have enough points
-        if len(track.points) >= self.min_track_points:
+        if track.n >= self.min_track_points:
             speed = self._calculate_speed(track)
             if speed is not None:
                 track.add_speed(speed)
-                self.speed_measurements.append(speed)
+                self._accumulate(speed)
                 return track.get_average_speed()
         
         return None
     
     def _calculate_speed(self, track: VehicleTrack) -> Optional[float]:
         """Calculate instantaneous speed for a track."""
-        if len(track.points) < 2:
-            return None
-        
-        # Use recent points for speed calculation
-        recent_points = list(track.points)[-self.min_track_points:]
-        
-        if len(recent_points) < 2:
+        if track.n < 2:
             return None
-        
-        # Calculate speed using linear regression or simple average
-        total_distance = 0
-        total_time = 0
-        
-        for i in range(1, len(recent_points)):
-            prev_point = recent_points[i-1]
-            curr_point = recent_points[i]
-            
-            # Distance in meters
-            dx = curr_point.world_pos[0] - prev_point.world_pos[0]
-            dy = curr_point.world_pos[1] - prev_point.world_pos[1]
-            distance = math.sqrt(dx*dx + dy*dy)
-            
-            # Time in seconds
-            time_diff = curr_point.timestamp - prev_point.timestamp
-            
-            if time_diff > 0:
-                total_distance += distance
-                total_time += time_diff
-        
-        if total_time > 0:
-            # Speed in m/s, convert to km/h
-            speed_ms = total_distance / total_time
-            speed_kmh = speed_ms * 3.6
-            
-            # Filter out unrealistic speeds
-            if 0 < speed_kmh < 200:  # Reasonable speed range
-                return speed_kmh
-        
+
+        # Use recent points for speed calculation (JIT-compiled kernel)
+        world_xy, times = track.recent_window(self.min_track_points)
+        speed_kmh = calc_speed(world_xy, times)
+
+        # Filter out unrealistic speeds
+        if 0 < speed_kmh < 200:  # Reasonable speed range
+            return speed_kmh
+
         return None
     
+    def _accumulate(self, speed: float):
+        """Fold one measurement into the running statistics (Welford)."""
+        self._count += 1
+        delta = speed - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (speed - self._mean)
+        if speed < self._min_speed:
+            self._min_speed = speed
+        if speed > self._max_speed:
+            self._max_speed = speed
+
     def get_statistics(self) -> Dict[str, Any]:
         """Get speed estimation statistics."""
-        if not self.speed_measurements:
+        if self._count == 0:
             return {
                 'total_vehicles': self.total_vehicles,
                 'measurements': 0,
@@ -122,23 +113,23 @@ class SpeedEstimator:
                 'min_speed': None,
                 'std_speed': None
             }
-        
-        speeds = np.array(self.speed_measurements)
+
         return {
             'total_vehicles': self.total_vehicles,
-            'measurements': len(speeds),
-            'average_speed': float(np.mean(speeds)),
-            'max_speed': float(np.max(speeds)),
-            'min_speed': float(np.min(speeds)),
-            'std_speed': float(np.std(speeds))
+            'measurements': self._count,
+            'average_speed': self._mean,
+            'max_speed': self._max_speed,
+            'min_speed': self._min_speed,
+            'std_speed': math.sqrt(self._m2 / self._count)
         }
     
     def cleanup_old_tracks(self, current_time: float, max_age: float = 10.0):
         """Remove old tracks that haven't been updated recently."""
-        to_remove = []
-        for track_id, track in self.vehicle_tracks.items():
-            if current_time - track.last_update > max_age:
-                to_remove.append(track_id)
-        
-        for track_id in to_remove:
-            del self.vehicle_tracks[track_id]
\ No newline at end of file
+        cutoff = current_time - max_age
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            timestamp, track_id = heapq.heappop(self._expiry_heap)
+            track = self.vehicle_tracks.get(track_id)
+            # Every update re-pushes the track, so older heap entries are
+            # stale; only delete when popping the track's newest entry
+            if track is not None and track.last_update == timestamp:
+                del self.vehicle_tracks[track_id]
\ No newline at end of file
@@ -1,114 +1,155 @@
-"""
-Simple multi-object tracker for vehicle tracking.
-"""
-
-import math
-import numpy as np
-from typing import Dict, List, Tuple
-from data_structures import Detection
-
-
-class SimpleTracker:
-    """Simple multi-object tracker using IoU and centroid distance."""
-    
-    def __init__(self, max_disappeared: int = 30, max_distance: float = 100):
-        self.next_id = 1
-        self.tracks: Dict[int, Dict] = {}
-        self.max_disappeared = max_disappeared
-        self.max_distance = max_distance
-    
-    def update(self, detections: List[Detection]) -> List[Tuple[int, Detection]]:
-        """
-        Update tracker with new detections.
-        
-        Returns:
-            List of (track_id, detection) pairs
-        """
-        if not detections:
-            # Mark all tracks as disappeared
-            to_remove = []
-            for track_id in self.tracks:
-                self.tracks[track_id]['disappeared'] += 1
-                if self.tracks[track_id]['disappeared'] > self.max_disappeared:
-                    to_remove.append(track_id)
-            
-            for track_id in to_remove:
-                del self.tracks[track_id]
-            
-            return []
-        
-        # If no existing tracks, create new ones
-        if not self.tracks:
-            results = []
-            for detection in detections:
-                track_id = self._create_new_track(detection)
-                results.append((track_id, detection))
-            return results
-        
-        # Calculate distances between existing tracks and new detections
-        track_ids = list(self.tracks.keys())
-        track_centers = [self.tracks[tid]['center'] for tid in track_ids]
-        detection_centers = [det.center for det in detections]
-        
-        # Create distance matrix
-        distances = np.zeros((len(track_ids), len(detections)))
-        for i, track_center in enumerate(track_centers):
-            for j, det_center in enumerate(detection_centers):
-                distances[i, j] = math.sqrt(
-                    (track_center[0] - det_center[0])**2 + 
-                    (track_center[1] - det_center[1])**2
-                )
-        
-        # Assign detections to tracks using simple greedy approach
-        used_detections = set()
-        used_tracks = set()
-        results = []
-        
-        # Sort by distance and assign
-        assignments = []
-        for i in range(len(track_ids)):
-            for j in range(len(detections)):
-                if distances[i, j] < self.max_distance:
-                    assignments.append((distances[i, j], i, j))
-        
-        assignments.sort()  # Sort by distance
-        
-        for distance, track_idx, det_idx in assignments:
-            if track_idx not in used_tracks and det_idx not in used_detections:
-                track_id = track_ids[track_idx]
-                detection = detections[det_idx]
-                
-                # Update track
-                self.tracks[track_id]['center'] = detection.center
-                self.tracks[track_id]['disappeared'] = 0
-                
-                results.append((track_id, detection))
-                used_tracks.add(track_idx)
-                used_detections.add(det_idx)
-        
-        # Create new tracks for unassigned detections
-        for j, detection in enumerate(detections):
-            if j not in used_detections:
-                track_id = self._create_new_track(detection)
-                results.append((track_id, detection))
-        
-        # Mark unassigned tracks as disappeared
-        for i, track_id in enumerate(track_ids):
-            if i not in used_tracks:
-                self.tracks[track_id]['disappeared'] += 1
-                if self.tracks[track_id]['disappeared'] > self.max_disappeared:
-                    del self.tracks[track_id]
-        
-        return results
-    
-    def _create_new_track(self, detection: Detection) -> int:
-        """Create a new track."""
-        track_id = self.next_id
-        self.next_id += 1
-        
-        self.tracks[track_id] = {
-            'center': detection.center,
-            'disappeared': 0
-        }
-        
-        return track_id
\ No newline at end of file
+"""
+Simple multi-object tracker for vehicle tracking.
+"""
+
+import numpy as np
+from typing import Dict, List, Tuple
+from data_structures import Detections
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+class SimpleTracker:
+    """Simple multi-object tracker using IoU and centroid distance."""
+
+    # Initial capacity of the persistent center array; doubled as needed
+    _INITIAL_CAPACITY = 16
+
+    # Cost assigned to pairs beyond max_distance so the Hungarian solver
+    # never prefers them over leaving a track/detection unmatched
+    _INFEASIBLE = 1e9
+
+    def __init__(self, max_disappeared: int = 30, max_distance: float = 100):
+        self.next_id = 1
+        self.tracks: Dict[int, Dict] = {}
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+
+        # Persistent parallel state for live tracks, maintained
+        # incrementally so update() doesn't rebuild id lists and center
+        # arrays from the dict every frame
+        self._track_ids: List[int] = []
+        self._row_of: Dict[int, int] = {}
+        self._centers = np.empty((self._INITIAL_CAPACITY, 2), dtype=np.float32)
+
+    def update(self, detections: Detections) -> List[Tuple[int, int]]:
+        """
+        Update tracker with new detections.
+
+        Returns:
+            List of (track_id, detection_index) pairs, where the index
+            selects a row of `detections`
+        """
+        num_tracks = len(self._track_ids)
+
+        if len(detections) == 0:
+            # Mark all tracks as disappeared
+            to_remove = []
+            for track_id in self._track_ids:
+                self.tracks[track_id]['disappeared'] += 1
+                if self.tracks[track_id]['disappeared'] > self.max_disappeared:
+                    to_remove.append(track_id)
+
+            for track_id in to_remove:
+                self._remove_track(track_id)
+
+            return []
+
+        detection_centers = detections.centers
+
+        # If no existing tracks, create new ones
+        if num_tracks == 0:
+            return [(self._create_new_track(detection_centers[j]), j)
+                    for j in range(len(detections))]
+
+        # Calculate distances between existing tracks and new detections;
+        # the track centers are a view of the persistent array
+        track_centers = self._centers[:num_tracks]
+        diff = track_centers[:, None, :] - detection_centers[None, :, :]
+        distances = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+        num_detections = len(detections)
+        used_tracks = np.zeros(num_tracks, dtype=bool)
+        used_detections = np.zeros(num_detections, dtype=bool)
+        results = []
+
+        def assign(track_idx: int, det_idx: int):
+            track_id = self._track_ids[track_idx]
+            self._centers[track_idx] = detection_centers[det_idx]
+            self.tracks[track_id]['disappeared'] = 0
+            results.append((track_id, det_idx))
+            used_tracks[track_idx] = True
+            used_detections[det_idx] = True
+
+        if SCIPY_AVAILABLE:
+            # Optimal (Hungarian) assignment over the cost matrix, with
+            # pairs beyond max_distance made infeasible
+            cost = np.where(distances < self.max_distance,
+                            distances, self._INFEASIBLE)
+            for track_idx, det_idx in zip(*linear_sum_assignment(cost)):
+                if cost[track_idx, det_idx] < self._INFEASIBLE:
+                    assign(int(track_idx), int(det_idx))
+        else:
+            # Greedy fallback: visit candidate pairs nearest-first
+            order = np.argsort(distances, axis=None)
+            for flat_idx in order:
+                if distances.flat[flat_idx] >= self.max_distance:
+                    break  # Remaining pairs are all farther away
+                track_idx, det_idx = divmod(int(flat_idx), num_detections)
+                if not used_tracks[track_idx] and not used_detections[det_idx]:
+                    assign(track_idx, det_idx)
+
+        # Mark unassigned tracks as disappeared (row indices are still
+        # valid here because nothing has been added or removed yet)
+        to_remove = []
+        for track_idx in np.flatnonzero(~used_tracks):
+            track_id = self._track_ids[track_idx]
+            self.tracks[track_id]['disappeared'] += 1
+            if self.tracks[track_id]['disappeared'] > self.max_disappeared:
+                to_remove.append(track_id)
+
+        # Create new tracks for unassigned detections
+        for det_idx in np.flatnonzero(~used_detections):
+            track_id = self._create_new_track(detection_centers[det_idx])
+            results.append((track_id, int(det_idx)))
+
+        for track_id in to_remove:
+            self._remove_track(track_id)
+
+        return results
+
+    def _create_new_track(self, center: np.ndarray) -> int:
+        """Create a new track at the given center point."""
+        track_id = self.next_id
+        self.next_id += 1
+
+        row = len(self._track_ids)
+        if row == self._centers.shape[0]:
+            grown = np.empty((2 * row, 2), dtype=np.float32)
+            grown[:row] = self._centers
+            self._centers = grown
+
+        self._centers[row] = center
+        self._track_ids.append(track_id)
+        self._row_of[track_id] = row
+        self.tracks[track_id] = {'disappeared': 0}
+
+        return track_id
+
+    def _remove_track(self, track_id: int):
+        """Remove a track, swapping the last row into its slot."""
+        row = self._row_of.pop(track_id)
+        last = len(self._track_ids) - 1
+
+        if row != last:
+            moved_id = self._track_ids[last]
+            self._track_ids[row] = moved_id
+            self._centers[row] = self._centers[last]
+            self._row_of[moved_id] = row
+
+        self._track_ids.pop()
+        del self.tracks[track_id]
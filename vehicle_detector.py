@@ -2,9 +2,12 @@
 Vehicle detection using YOLOv8.
 """
 
+import os
+import cv2
 import numpy as np
+from dataclasses import replace
 from typing import List
-from data_structures import Detection
+from data_structures import Detections
 
 try:
     from ultralytics import YOLO
@@ -13,6 +16,12 @@ except ImportError:
     print("Warning: ultralytics not installed. Install with: pip install ultralytics")
     YOLO_AVAILABLE = False
 
+try:
+    import torch
+    CUDA_AVAILABLE = torch.cuda.is_available()
+except ImportError:
+    CUDA_AVAILABLE = False
+
 
 class VehicleDetector:
     """Vehicle detection using YOLOv8."""
@@ -25,12 +34,35 @@ class VehicleDetector:
         7: 'truck'
     }
     
-    def __init__(self, model_path: str = "yolov8x.pt", confidence_threshold: float = 0.5):
+    def __init__(self, model_path: str = "yolov8x.pt", confidence_threshold: float = 0.5,
+                 use_tensorrt: bool = True, imgsz: int = 960, use_pinned: bool = True,
+                 skip_static: bool = True, static_threshold: float = 3.0,
+                 batch_size: int = 4):
         self.confidence_threshold = confidence_threshold
-        
+        self.batch_size = batch_size
+        self.device = 0 if CUDA_AVAILABLE else 'cpu'
+        self.half = CUDA_AVAILABLE  # FP16 halves memory bandwidth on GPU
+        # Inference resolution: YOLO letterboxes down to this and scales
+        # boxes back, so outputs stay in original frame coordinates
+        self.imgsz = imgsz
+
+        # Pinned-memory staging buffers so host-to-device copies run as
+        # async DMA on a side stream instead of stalling inference
+        self._use_pinned = use_pinned and CUDA_AVAILABLE
+        self._pinned = None
+        self._device_u8 = None
+        self._stream = None
+
+        # Frame-difference gate: frames nearly identical to their
+        # predecessor reuse the previous detections instead of running YOLO
+        self._skip_static = skip_static
+        self._static_threshold = static_threshold
+        self._prev_small = None
+        self._cached_detections = Detections.empty()
+
         if not YOLO_AVAILABLE:
             raise ImportError("ultralytics package not available. Install with: pip install ultralytics")
-        
+
         try:
             print(f"Loading YOLO model: {model_path}")
             self.model = YOLO(model_path)
@@ -38,32 +70,236 @@ class VehicleDetector:
         except Exception as e:
             print(f"✗ Failed to load YOLO model: {e}")
             raise
+
+        if use_tensorrt and CUDA_AVAILABLE and model_path.endswith('.pt'):
+            self._load_tensorrt_engine(model_path)
+
+    def _load_tensorrt_engine(self, model_path: str):
+        """Swap the PyTorch checkpoint for a TensorRT FP16 engine.
+
+        The engine is exported once next to the .pt file and reused on
+        subsequent runs. Falls back to the PyTorch model if export or
+        loading fails (e.g. TensorRT not installed). The export uses a
+        dynamic batch axis up to the pipeline's batch size: a fixed-shape
+        engine would reject every batch that doesn't match its binding
+        exactly, and sub-size batches are routine (the final partial
+        batch of a video, batches thinned by the static-frame gate, and
+        single-frame detect() calls).
+        """
+        engine_path = model_path[:-len('.pt')] + '.engine'
+        try:
+            if not os.path.exists(engine_path):
+                print("Exporting TensorRT FP16 engine (one-time, may take several minutes)...")
+                self.model.export(format='engine', half=True, device=0,
+                                  imgsz=self.imgsz, batch=self.batch_size,
+                                  dynamic=True)
+            self.model = YOLO(engine_path)
+            print(f"✓ TensorRT FP16 engine loaded: {engine_path}")
+        except Exception as e:
+            print(f"Warning: TensorRT engine unavailable ({e}), using PyTorch model")
+            return
+
+        self._verify_engine_batch(engine_path)
+
+    def _verify_engine_batch(self, engine_path: str):
+        """Fail loudly if the engine can't run the batch sizes we use.
+
+        Both the full batch and a single frame are exercised: a stale
+        fixed-shape engine (whether batch-1 or batch-N) passes one of
+        the two and would otherwise error on every mismatched batch at
+        runtime while smoke tests keep passing.
+        """
+        for batch in sorted({1, self.batch_size}):
+            try:
+                dummy = [np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+                         for _ in range(batch)]
+                self.model(dummy, verbose=False, imgsz=self.imgsz,
+                           device=self.device, half=self.half)
+            except Exception as e:
+                raise RuntimeError(
+                    f"TensorRT engine {engine_path} cannot run batches of "
+                    f"{batch} frame(s) — it was likely exported with a fixed "
+                    f"batch size or a different image size. Delete the engine "
+                    f"file to re-export it. Original error: {e}"
+                ) from e
     
-    def detect(self, frame: np.ndarray) -> List[Detection]:
-        """Detect vehicles in frame."""
-        results = self.model(frame, verbose=False)
-        detections = []
-        
+    def detect(self, frame: np.ndarray) -> Detections:
+        """Detect vehicles in a single frame."""
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[Detections]:
+        """
+        Detect vehicles in a batch of frames with a single model call.
+
+        Batching amortizes per-call preprocessing and kernel launch
+        overhead, so this is much faster than calling detect() per frame.
+
+        Args:
+            frames: List of BGR frames (uniform size; YOLO letterboxes internally)
+
+        Returns:
+            One Detections set per input frame
+        """
+        if not frames:
+            return []
+
+        if not self._skip_static:
+            return self._run_model(frames)
+
+        # Gate: only frames that changed visibly go through the model
+        is_static = [self._is_static(frame) for frame in frames]
+        run_frames = [frame for frame, static in zip(frames, is_static)
+                      if not static]
+        computed = self._run_model(run_frames)
+
+        batch_detections = []
+        next_computed = iter(computed)
+        for static in is_static:
+            if not static:
+                self._cached_detections = next(next_computed)
+                batch_detections.append(self._cached_detections)
+            else:
+                # Mark reused results so downstream consumers know these
+                # positions are stale and must not feed tracking/speeds
+                batch_detections.append(
+                    replace(self._cached_detections, reused=True))
+        return batch_detections
+
+    # Thumbnail and block geometry for the static-frame gate; 10x10
+    # thumbnail-pixel blocks keep a single distant vehicle large relative
+    # to its block instead of vanishing into a global average
+    _GATE_SIZE = (160, 90)
+    _GATE_BLOCK = 10
+
+    def _is_static(self, frame: np.ndarray) -> bool:
+        """Check whether frame is nearly identical to its predecessor.
+
+        The frame counts as static only if no block of the thumbnail
+        changed by more than the threshold on average. A global mean
+        would let one moving vehicle (~100 of 14400 thumbnail pixels)
+        shift the score by well under any usable threshold.
+        """
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
+                           self._GATE_SIZE)
+        prev_small = self._prev_small
+        self._prev_small = small
+
+        if prev_small is None:
+            return False
+
+        diff = np.abs(small.astype(np.int16) - prev_small.astype(np.int16))
+        height, width = diff.shape
+        block = self._GATE_BLOCK
+        block_means = diff.reshape(height // block, block,
+                                   width // block, block).mean(axis=(1, 3))
+        return float(block_means.max()) < self._static_threshold
+
+    def _run_model(self, frames: List[np.ndarray]) -> List[Detections]:
+        """Run YOLO on frames via the fastest available path."""
+        if not frames:
+            return []
+
+        if self._use_pinned:
+            try:
+                return self._detect_batch_pinned(frames)
+            except Exception as e:
+                print(f"Warning: pinned-memory path failed ({e}), "
+                      f"falling back to standard preprocessing")
+                self._use_pinned = False
+
+        results = self.model(frames, verbose=False, imgsz=self.imgsz,
+                             device=self.device, half=self.half)
+        return self._extract_detections(results)
+
+    def _ensure_buffers(self, batch_size: int):
+        """(Re)allocate pinned/device staging buffers for batch_size frames."""
+        if self._pinned is not None and self._pinned.shape[0] >= batch_size:
+            return
+        shape = (batch_size, self.imgsz, self.imgsz, 3)
+        self._pinned = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+        self._pinned.fill_(114)  # YOLO letterbox padding gray
+        self._device_u8 = torch.empty(shape, dtype=torch.uint8, device='cuda')
+        self._stream = torch.cuda.Stream()
+
+    def _detect_batch_pinned(self, frames: List[np.ndarray]) -> List[Detections]:
+        """
+        Inference path that stages frames through pinned host memory.
+
+        Frames are letterboxed into a preallocated page-locked buffer
+        (aspect-preserving resize, gray padding — matching YOLO's own
+        preprocessing) and uploaded with non_blocking copies on a
+        dedicated stream, so the DMA overlaps with other GPU work.
+        Boxes come back in letterboxed coordinates and are mapped back
+        to the original frame.
+        """
+        batch_size = len(frames)
+        height, width = frames[0].shape[:2]
+        size = self.imgsz
+        self._ensure_buffers(batch_size)
+
+        # Letterbox geometry: uniform scale plus centered padding. The
+        # buffer is pre-filled with the padding gray, so only the
+        # content region is written per frame.
+        ratio = min(size / width, size / height)
+        new_w, new_h = round(width * ratio), round(height * ratio)
+        pad_x = (size - new_w) // 2
+        pad_y = (size - new_h) // 2
+
+        pinned = self._pinned[:batch_size]
+        pinned_np = pinned.numpy()
+        for i, frame in enumerate(frames):
+            pinned_np[i, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+                frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        with torch.cuda.stream(self._stream):
+            device_u8 = self._device_u8[:batch_size]
+            device_u8.copy_(pinned, non_blocking=True)
+            # BHWC uint8 BGR -> BCHW float RGB in [0, 1]
+            tensor = device_u8.flip(-1).permute(0, 3, 1, 2).contiguous()
+            tensor = (tensor.half() if self.half else tensor.float()).div_(255.0)
+        torch.cuda.current_stream().wait_stream(self._stream)
+
+        results = self.model(tensor, verbose=False, imgsz=size,
+                             device=self.device, half=self.half)
+
+        # Undo the letterbox: remove the padding offset, then the scale
+        return self._extract_detections(
+            results, scale=ratio, pad=(pad_x, pad_y))
+
+    def _extract_detections(self, results, scale: float = 1.0,
+                            pad: tuple = (0, 0)) -> List[Detections]:
+        """Convert YOLO results to one Detections set per frame."""
+        batch_detections = []
+
         for result in results:
             boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get box coordinates and confidence
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = float(box.conf[0].cpu().numpy())
-                    class_id = int(box.cls[0].cpu().numpy())
-                    
-                    # Filter for vehicles with sufficient confidence
-                    if (class_id in self.VEHICLE_CLASSES and 
-                        confidence >= self.confidence_threshold):
-                        
-                        detection = Detection(
-                            x1=float(x1), y1=float(y1),
-                            x2=float(x2), y2=float(y2),
-                            confidence=confidence,
-                            class_id=class_id,
-                            class_name=self.VEHICLE_CLASSES[class_id]
-                        )
-                        detections.append(detection)
-        
-        return detections
\ No newline at end of file
+            if boxes is None or len(boxes) == 0:
+                batch_detections.append(Detections.empty())
+                continue
+
+            # Pull all box data off the GPU in one detached transfer per
+            # tensor; the class-id narrowing happens on-device so the
+            # copy is already int32
+            xyxy = boxes.xyxy.detach().cpu().numpy()
+            conf = boxes.conf.detach().cpu().numpy()
+            cls = boxes.cls.detach().int().cpu().numpy()
+
+            # Filter for vehicles with sufficient confidence
+            mask = (np.isin(cls, list(self.VEHICLE_CLASSES)) &
+                    (conf >= self.confidence_threshold))
+
+            cls = cls[mask]
+            xyxy = xyxy[mask].astype(np.float32)
+            if scale != 1.0 or pad != (0, 0):
+                xyxy[:, 0::2] -= pad[0]
+                xyxy[:, 1::2] -= pad[1]
+                xyxy /= scale
+
+            batch_detections.append(Detections(
+                xyxy=xyxy,
+                conf=conf[mask].astype(np.float32),
+                cls=cls,
+                names=[self.VEHICLE_CLASSES[c] for c in cls.tolist()]
+            ))
+
+        return batch_detections
\ No newline at end of file